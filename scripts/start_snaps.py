@@ -4,96 +4,140 @@ Convenience launcher for multi_snap_config.py using configs/snap_startup.yaml.
 
 This:
   1. Reads preferred arguments from configs/snap_startup.yaml
-  2. Translates them to the CLI flags expected by src/multi_snap_config.py
-  3. Invokes multi_snap_config.main() directly (no subprocess).
+  2. Passes them straight to multi_snap_config.run() (no argv round-trip,
+     no subprocess).
+
+With ``--daemon`` the process stays up and reads one startup YAML path per
+line from stdin (an empty line re-uses ``--config``), so supervisors that
+restart the SNAPs repeatedly skip the interpreter and casm_f/numpy start-up.
+A ``reconnect`` line drops the cached board connections, e.g. after the
+SNAPs were power-cycled; a board whose start-up fails is dropped anyway.
 """
 
 from __future__ import annotations
 
 import argparse
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+from snap_control import multi_snap_config
+
+_STARTUP_SCHEMA = {
+    "type": "object",
+    "required": ["layout_yaml"],
+    "properties": {
+        "layout_yaml": {"type": "string"},
+        "ips": {"type": ["array", "null"], "items": {"type": "string"}},
+        "options": {
+            "type": ["object", "null"],
+            # Same choices as the multi_snap_config CLI flags
+            "properties": {
+                "nchan_packet": {"type": ["integer", "null"]},
+                "log_level": {"enum": multi_snap_config.LOG_LEVELS + [None]},
+                "programmed": {"type": ["boolean", "null"]},
+                "test_mode": {"enum": multi_snap_config.TEST_MODES + [None]},
+                "fft_shift": {"type": ["integer", "null"]},
+                "eq_coeffs": {"type": ["number", "null"]},
+                "adc_gain": {"enum": list(multi_snap_config.GAIN_MAP) + [None]},
+            },
+        },
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def _startup_validator() -> Optional[Callable[[object], object]]:
+    """Return the compiled startup validator, or ``None`` without fastjsonschema.
+
+    Without it only the top-level type is checked here, and run() still
+    rejects option values outside the CLI choices. Compiled on first use, not
+    at import, to keep it off the start-up path.
+    """
+    try:
+        import fastjsonschema
+    except ImportError:  # pragma: no cover
+        return None
+    return fastjsonschema.compile(_STARTUP_SCHEMA)
 
-import yaml  # PyYAML
-
-sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
-import multi_snap_config  # type: ignore
 
 def _load_startup_config(path: Path) -> Dict[str, Any]:
-    with path.open("r", encoding="utf-8") as fh:
-        cfg = yaml.safe_load(fh) or {}
+    # Shares multi_snap_config's parsed-YAML cache
+    cfg = multi_snap_config.load_yaml(path) or {}
+    validate = _startup_validator()
+    if validate is not None:
+        validate(cfg)
     if not isinstance(cfg, dict):
         raise ValueError("snap_startup.yaml must contain a mapping at top level")
     return cfg
 
 
-def _build_argv_from_yaml(cfg: Dict[str, Any]) -> List[str]:
-    """Translate snap_startup.yaml into argv-style arguments for multi_snap_config."""
+def _run_from_config(cfg: Dict[str, Any]) -> None:
+    """Configure the SNAPs described by a parsed snap_startup.yaml."""
 
     layout_yaml = cfg.get("layout_yaml")
     if not layout_yaml:
         raise ValueError("snap_startup.yaml must define 'layout_yaml'")
 
-    argv: List[str] = [str(layout_yaml)]
-
     # IPs
     ips: Optional[List[str]] = cfg.get("ips")
-    if ips:
-        argv.append("--ip")
-        argv.extend(str(ip) for ip in ips)
 
     # Options block
     opts: Dict[str, Any] = cfg.get("options") or {}
 
-    nchan_packet = opts.get("nchan_packet")
-    if nchan_packet is not None:
-        argv.extend(["--nchan-packet", str(nchan_packet)])
-
-    log_level = opts.get("log_level")
-    if log_level:
-        argv.extend(["--log-level", str(log_level)])
-
-    if opts.get("programmed"):
-        argv.append("--programmed")
-
-    test_mode = opts.get("test_mode")
-    if test_mode:
-        argv.extend(["--test-mode", str(test_mode)])
-
-    fft_shift = opts.get("fft_shift")
-    if fft_shift is not None:
-        argv.extend(["--fft_shift", str(fft_shift)])
-
-    eq_coeffs = opts.get("eq_coeffs")
-    if eq_coeffs is not None:
-        argv.extend(["--eq_coeffs", str(eq_coeffs)])
+    multi_snap_config.run(
+        str(layout_yaml),
+        ips=[str(ip) for ip in ips] if ips else None,
+        nchan_packet=opts.get("nchan_packet"),
+        log_level=opts.get("log_level") or "INFO",
+        programmed=bool(opts.get("programmed")),
+        test_mode=opts.get("test_mode") or None,
+        fft_shift=opts.get("fft_shift"),
+        eq_coeffs=opts.get("eq_coeffs"),
+        adc_gain=opts.get("adc_gain"),
+    )
 
-    adc_gain = opts.get("adc_gain")
-    if adc_gain is not None:
-        argv.extend(["--adc_gain", str(adc_gain)])
 
-    return argv
+def _serve(default_config: Path) -> None:
+    """Run a start-up for every line read from stdin until EOF."""
+    for line in sys.stdin:
+        if line.strip() == "reconnect":
+            multi_snap_config.close_fengines()
+            continue
+        path = Path(line.strip()) if line.strip() else default_config
+        try:
+            _run_from_config(_load_startup_config(path))
+        except Exception:
+            multi_snap_config.LOGGER.exception("Start-up from %s failed", path)
+
+
+# Built once at import rather than on every main() call
+_PARSER = argparse.ArgumentParser(
+    description="Start SNAP boards using configs/snap_startup.yaml"
+)
+_PARSER.add_argument(
+    "--config",
+    type=Path,
+    default=Path(__file__).resolve().parents[1] / "configs" / "snap_startup.yaml",
+    help="Path to startup YAML (default: configs/snap_startup.yaml)",
+)
+_PARSER.add_argument(
+    "--daemon",
+    action="store_true",
+    help="Stay running and start the SNAPs once per config path read from stdin",
+)
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Start SNAP boards using configs/snap_startup.yaml"
-    )
-    parser.add_argument(
-        "--config",
-        type=Path,
-        default=Path(__file__).resolve().parents[1] / "configs" / "snap_startup.yaml",
-        help="Path to startup YAML (default: configs/snap_startup.yaml)",
-    )
-    args = parser.parse_args()
+    args = _PARSER.parse_args()
 
-    cfg = _load_startup_config(args.config)
-    argv = _build_argv_from_yaml(cfg)
+    if args.daemon:
+        _serve(args.config)
+        return
 
-    # Emulate command-line invocation of multi_snap_config.py
-    sys.argv = ["multi_snap_config.py", *argv]
-    multi_snap_config.main()
+    cfg = _load_startup_config(args.config)
+    _run_from_config(cfg)
 
 
 if __name__ == "__main__":
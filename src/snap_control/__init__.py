@@ -0,0 +1 @@
+"""Utilities for configuring multiple CASM SNAP boards from YAML layouts."""
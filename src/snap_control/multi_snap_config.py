@@ -0,0 +1,930 @@
+#!/usr/bin/env python3
+"""
+Multi‑SNAP board configuration utility for CASM
+================================================
+
+This script automates the following workflow for an arbitrary number of SNAP
+boards described in a YAML configuration file:
+
+1. Reads board‑specific networking and firmware parameters from YAML.
+2. Establishes a control connection to each SNAP (via the Raspberry‑Pi/KATCP or
+   MicroBlaze interface – whichever the firmware presents).
+3. Programs the FPGA with the requested *.fpg* bitstream (unless already
+   programmed), including automatic ADC link training and block initialisation.
+4. Executes :py:meth:`casm_f.snap_fengine.SnapFengine.configure` with the
+   appropriate ``source`` and ``destination`` parameters so that each board
+   streams its part of the 4096‑channel band to the requested downstream
+   NIC(s) and frequency ranges.
+5. Prints a concise per‑board status summary (GB/s, packet‑rate, error flags).
+
+The top‑level key **boards** is a list so you can describe any number of SNAPs.
+
+Usage
+-----
+
+.. code:: bash
+
+   $ python -m snap_control.multi_snap_config casm_feng_layout.yaml [--nchan-packet 512]
+
+Requirements
+~~~~~~~~~~~~
+* Python ≥ 3.8
+* ``casm_f`` installed (see CASM SNAP F‑Engine docs).
+* Network reachability to all SNAPs.
+
+"""
+from __future__ import annotations
+
+import numpy as np
+import argparse
+import atexit
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from subprocess import Popen, PIPE
+import yaml  # PyYAML
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+import time
+
+# CASM library import — errors out cleanly if missing
+try:
+    from casm_f import snap_fengine  # type: ignore
+except ImportError:  # pragma: no cover
+    sys.exit(
+        "casm_f not importable – install it in your Python environment first "
+        "(see https://github.com/casm-project/casm_f)."
+    )
+
+from casperfpga import CasperFpga, TapcpTransport
+
+# Prefer the LibYAML-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as _YLoader
+
+LOGGER = logging.getLogger("multi_snap_config")
+_LOG_FORMATTER = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+class ConfigError(ValueError):
+    """Bad :func:`run` option or layout, raised before any board is touched."""
+
+_LAYOUT_SCHEMA = {
+    "type": "object",
+    "required": ["common", "boards"],
+    "properties": {
+        "common": {
+            "type": "object",
+            "required": ["fpgfile", "destinations"],
+            "properties": {
+                "fpgfile": {"type": "string"},
+                "source_port": {"type": "integer"},
+                "nchan": {"type": "integer"},
+                "nchan_packet": {"type": "integer"},
+                "destinations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": ["ip", "mac", "start_chan", "dest_port"],
+                        "properties": {
+                            "ip": {"type": "string"},
+                            "mac": {"type": ["string", "integer"]},
+                            "start_chan": {"type": "integer"},
+                            "dest_port": {"type": "integer"},
+                            "nchan": {"type": "integer"},
+                        },
+                    },
+                },
+            },
+        },
+        "boards": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["host"],
+                "properties": {
+                    "host": {"type": "string"},
+                    "source_ip": {"type": "string"},
+                    "source_mac": {"type": ["string", "integer"]},
+                    "feng_id": {"type": "integer"},
+                },
+            },
+        },
+    },
+}
+
+@lru_cache(maxsize=None)
+def _layout_validator() -> Optional[Callable[[object], object]]:
+    """Return the compiled layout validator, or ``None`` without fastjsonschema.
+
+    fastjsonschema is optional: without it _load_layout falls back to its
+    basic structural checks. Compiling takes a few ms, so it is done on the
+    first validation rather than at import.
+    """
+    try:
+        import fastjsonschema
+    except ImportError:  # pragma: no cover
+        return None
+    return fastjsonschema.compile(_LAYOUT_SCHEMA)
+
+# -----------------------------------------------------------------------------
+# YAML helpers
+# -----------------------------------------------------------------------------
+
+@lru_cache(maxsize=256)
+def _mac_to_int(mac: Union[str, int]) -> int:
+    """Convert a MAC address given as *str* (colon or hex) or *int* -> int."""
+    if isinstance(mac, int):
+        return mac
+    # Fast path for the canonical ``xx:xx:xx:xx:xx:xx`` form used in the YAML
+    if len(mac) == 17 and mac[2] == ":":
+        return int(mac.replace(":", ""), 16)
+    mac = mac.strip()
+    if mac.startswith("0x"):
+        return int(mac, 16)
+    return int(mac.replace(":", ""), 16)
+
+# HMCAD1511 coarse gain -> 4-bit register code
+GAIN_MAP = {
+        1    : 0b0000,
+        1.25 : 0b0001,
+        2    : 0b0010,
+        2.5  : 0b0011,
+        4    : 0b0100,
+        5    : 0b0101,
+        8    : 0b0110,
+        10   : 0b0111,
+        12.5 : 0b1000,
+        16   : 0b1001,
+        20   : 0b1010,
+        25   : 0b1011,
+        32   : 0b1100,
+        50   : 0b1101
+}
+
+def _set_gain(adc, gain): 
+    # ADC is an HMCAD1511 object
+
+    """
+    Set the coarse gain of the ADC. Allowed values
+    are 1, 1.25, 2, 2.5, 4, 5, 8, 10, 12.5, 16, 20, 25, 32, 50.
+    """
+    # The same code is written to all four 4-bit channel fields
+    adc.write(GAIN_MAP[gain] * 0x1111, 0x2A) 
+
+def load_yaml(path: Path):
+    """Parse the YAML file at *path*, reusing a JSON copy when unchanged.
+
+    The parsed document is cached next to the YAML as ``<name>.json``, with
+    the YAML's ``(mtime_ns, size)`` stamp so editing the file invalidates it.
+    JSON rather than pickle: like the SafeLoader it can only produce plain
+    data, so a planted cache file cannot run code. Documents JSON cannot
+    represent exactly (dates, non-string keys) are simply not cached. Cache
+    problems (unwritable directory, stale or corrupt file) are never fatal.
+    """
+    st = path.stat()
+    stamp = [st.st_mtime_ns, st.st_size]
+    cache = path.with_suffix(path.suffix + ".json")
+    try:
+        cached = json.loads(cache.read_bytes())
+        if cached["stamp"] == stamp:
+            return cached["data"]
+    except Exception:
+        pass
+
+    # Binary mode: the loader detects the encoding and decodes the bytes itself.
+    # The file is mmapped (prefaulted where supported) so the parser reads
+    # straight from the page cache instead of through buffered file reads.
+    if st.st_size == 0:
+        cfg = None  # mmap refuses empty files; an empty document loads as None
+    else:
+        with path.open("rb") as fh, mmap.mmap(
+            fh.fileno(), 0,
+            flags=mmap.MAP_SHARED | getattr(mmap, "MAP_POPULATE", 0),
+            prot=mmap.PROT_READ,
+        ) as mm:
+            cfg = yaml.load(mm, Loader=_YLoader)
+
+    tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        text = json.dumps({"stamp": stamp, "data": cfg})
+        if json.loads(text)["data"] == cfg:
+            tmp.write_text(text)
+            os.replace(tmp, cache)
+    except Exception as exc:
+        LOGGER.debug("Could not write YAML cache %s: %s", cache, exc)
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+    return cfg
+
+def _load_layout(path_like: Union[str, Path]) -> Tuple[dict, List[dict]]:
+    """Load YAML from *path_like* (``str`` or ``Path``).
+
+    Returns ``(common_cfg, boards_list)`` after basic validation so callers can
+    use either ``_load_layout('file.yaml')`` or ``_load_layout(Path('file.yaml'))``.
+    """
+    cfg = load_yaml(Path(path_like))
+    validate = _layout_validator()
+    if validate is not None:
+        # JsonSchemaException is a ValueError subclass, like the checks below
+        validate(cfg)
+        return cfg["common"], cfg["boards"]
+    if not isinstance(cfg, dict):
+        raise ValueError("Top‑level YAML must be a mapping (dict)")
+
+    common = cfg.get("common")
+    boards = cfg.get("boards")
+    if common is None or boards is None:
+        raise ValueError("YAML requires both 'common' and 'boards' blocks")
+    if not isinstance(boards, list):
+        raise ValueError("'boards' must be a list")
+    return common, boards
+
+# -----------------------------------------------------------------------------
+# Configuration logic
+# -----------------------------------------------------------------------------
+
+# One SnapFengine per SNAP IP, reused across configure calls in this process
+_FENGINE_CACHE: Dict[str, "snap_fengine.SnapFengine"] = {}
+_FENGINE_LOCK = threading.Lock()
+
+def _get_fengine(source_ip: str):
+    """Return the cached ``SnapFengine`` for *source_ip*, connecting if needed."""
+    with _FENGINE_LOCK:
+        feng = _FENGINE_CACHE.get(source_ip)
+    if feng is None:
+        # Connect outside the lock so boards still come up in parallel
+        feng = snap_fengine.SnapFengine(source_ip, use_microblaze=True)
+        with _FENGINE_LOCK:
+            feng = _FENGINE_CACHE.setdefault(source_ip, feng)
+    return feng
+
+def _drop_fengine(source_ip: str) -> None:
+    """Forget the cached ``SnapFengine`` for *source_ip* and disconnect it."""
+    with _FENGINE_LOCK:
+        feng = _FENGINE_CACHE.pop(source_ip, None)
+    # Disconnect the underlying casperfpga handle, if the object has one
+    disconnect = getattr(getattr(feng, "fpga", None), "disconnect", None)
+    if disconnect is not None:
+        try:
+            disconnect()
+        except Exception:
+            pass
+
+@atexit.register
+def close_fengines() -> None:
+    """Drop every cached ``SnapFengine``, e.g. after boards were power-cycled."""
+    for source_ip in list(_FENGINE_CACHE):
+        _drop_fengine(source_ip)
+
+def _dropping_fengine(source_ip: str, fn: Callable[[], object]
+                      ) -> Callable[[], object]:
+    """Wrap the job *fn* so that, if it fails, *source_ip*'s connection is
+    dropped from the cache and the next run reconnects to the board."""
+    def job():
+        try:
+            return fn()
+        except Exception:
+            _drop_fengine(source_ip)
+            raise
+    return job
+
+# level() smooths each 4096-channel spectrum with a 32-tap, 3rd-order
+# Savitzky-Golay filter and keeps every 8th channel starting at 4. The filter
+# is fixed, so its kernels are built once: the interior kernel, plus kernels
+# for the outputs within half a window of either end, which reproduce
+# savgol_filter's default mode="interp" polynomial edge fit.
+_SG_WINDOW, _SG_ORDER = 32, 3
+_SG_NCHAN, _SG_START, _SG_STEP = 4096, 4, 8
+
+@lru_cache(maxsize=None)
+def _sg_kernels():
+    """Build ``(interior, head_pos, head, tail_pos, tail)`` on first use.
+
+    scipy is imported here rather than at module import: it is only needed
+    when the bandpass is levelled, not when ``--eq_coeffs`` is given.
+    """
+    from scipy.signal import savgol_coeffs
+
+    half = _SG_WINDOW // 2
+    head_pos = list(range(_SG_START, half, _SG_STEP))
+    tail_pos = [
+        i - (_SG_NCHAN - _SG_WINDOW)
+        for i in range(_SG_START, _SG_NCHAN, _SG_STEP) if i >= _SG_NCHAN - half
+    ]
+    head = np.array([savgol_coeffs(_SG_WINDOW, _SG_ORDER, pos=p, use="dot") for p in head_pos])
+    tail = np.array([savgol_coeffs(_SG_WINDOW, _SG_ORDER, pos=p, use="dot") for p in tail_pos])
+    return savgol_coeffs(_SG_WINDOW, _SG_ORDER), head_pos, head, tail_pos, tail
+
+def _smooth_decimate(data: np.ndarray) -> np.ndarray:
+    """Same as ``savgol_filter(data, 32, 3)[4::8]`` for a 4096-channel *data*."""
+    from scipy.ndimage import convolve1d
+
+    coeffs, head_pos, head, tail_pos, tail = _sg_kernels()
+    out = convolve1d(data, coeffs, mode="constant")[_SG_START::_SG_STEP]
+    out[:len(head_pos)] = head @ data[:_SG_WINDOW]
+    out[len(out) - len(tail_pos):] = tail @ data[-_SG_WINDOW:]
+    return out
+
+def level(snap, ncoeffs=512, default_coeff=2.5):
+    """ Flattens the bandpass using the eq_coeffs. 
+        Will only work if armed. Based on Vikram's DSA-110 code.
+
+        https://github.com/dsa110/SNAP_control/blob/master/SNAP_control/dsaX_snap.py
+
+    Args:
+        snap: The snap object
+        ncoeffs: The number of coefficients to use
+        default_coeff: The default coefficient to use
+
+    Returns:
+        None
+    """
+
+    snap.corr.set_acc_len(50000)
+    LOGGER.info("Set acc len to 50k")
+    LOGGER.info("Starting level control iterating over %d inputs", snap.n_inputs)
+
+    # Inputs are done one at a time: the correlator reads one input pair at a
+    # time, and the EQ writes go through the same board connection. One
+    # scratch buffer, cleared per input, holds the accumulated spectrum.
+    data = np.empty(4096, dtype=np.float64)
+
+    for st in range(snap.n_inputs):
+        LOGGER.info("Setting EQ coefficients for stream %d", st)
+        data.fill(0.0)
+
+        for ii in range(4):
+            data += np.real(snap.corr.get_new_corr(int(st),int(st)))
+
+        try:
+            # Fill dropped (zero) channels once, on the summed spectrum
+            zero = data == 0.0
+            if zero.all():
+                raise ValueError("no signal, spectrum is all zeros")
+            if zero.any():
+                np.copyto(data, np.median(data[~zero]), where=zero)
+
+            data_smooth = _smooth_decimate(data)
+            np.copyto(data_smooth, np.median(data_smooth[data_smooth>0.0]),
+                      where=data_smooth<=0.0)
+            data_smooth_voltage = np.sqrt(data_smooth)
+
+            coeffs = 2.5*4./data_smooth_voltage
+            # set_coeffs() accepts NaN/inf without complaint
+            if not np.isfinite(coeffs).all():
+                raise ValueError("non-finite coefficients")
+
+            if LOGGER.isEnabledFor(logging.INFO):
+                LOGGER.info("min %s max %s", coeffs.min(), coeffs.max())
+            snap.eq.set_coeffs(int(st),coeffs)
+            LOGGER.info("Set coeffs for stream %d", st)
+        except Exception as exc:
+            LOGGER.error("Could not set Eq coeffs for input %d: %s", st, exc)
+            snap.eq.set_coeffs(int(st),default_coeff+np.zeros(ncoeffs))
+
+    LOGGER.info("Finished level control")
+
+_PROC_ARP = "/proc/net/arp"
+
+def _arp_table() -> Dict[str, int]:
+    """Return the host's ARP cache as ``{ip: mac}`` (MACs as int).
+
+    Reads the kernel's table from ``/proc/net/arp`` in one pass; ``arp -n`` is
+    only spawned on systems without it. Incomplete entries are left out.
+    """
+    table: Dict[str, int] = {}
+    try:
+        with open(_PROC_ARP) as fh:
+            next(fh, None)  # header
+            for line in fh:
+                # IP address, HW type, Flags, HW address, Mask, Device
+                fields = line.split()
+                if len(fields) >= 4 and fields[2] != "0x0":
+                    table[fields[0]] = _mac_to_int(fields[3])
+        return table
+    except OSError:
+        pass
+
+    out = Popen(["arp", "-n"], stdout=PIPE).communicate()[0]
+    # Address HWtype HWaddress Flags Mask Iface -- the MAC is the third field
+    for line in out.decode("ascii", "ignore").splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and ":" in parts[2]:
+            table[parts[0]] = _mac_to_int(parts[2])
+    return table
+
+def _arp_lookup(ip: str, table: Optional[Dict[str, int]] = None) -> int:
+    """Return the MAC address (as int) for *ip* from *table* or a fresh read."""
+    if table is None:
+        table = _arp_table()
+    try:
+        return table[ip]
+    except KeyError:
+        raise LookupError("no ARP entry for %s" % ip) from None
+
+# Minimum wait after upload_to_ram_and_program before polling: the board can
+# still answer listdev for a moment before it drops off to reboot.
+_PROGRAM_SETTLE = 5.0
+
+def _wait_ready(ip: str, fpga=None, timeout: float = 20.0,
+                interval: float = 0.25):
+    """Poll the SNAP at *ip* until it answers a TAPCP ``listdev``.
+
+    Used instead of fixed sleeps after programming: returns as soon as the
+    board responds and raises :class:`TimeoutError` after *timeout* seconds.
+    Polls through *fpga* if given, otherwise opens one ``CasperFpga`` and
+    reuses it; the handle is returned so callers can keep using it.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if fpga is None:
+                fpga = CasperFpga(ip, transport=TapcpTransport)
+            fpga.listdev()
+            return fpga
+        except Exception as exc:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    "SNAP at %s not ready after %.0f s" % (ip, timeout)
+                ) from exc
+            time.sleep(interval)
+
+def _fpg_signature(fpgfile: str) -> Tuple[str, frozenset]:
+    """Return the md5 of *fpgfile* and the register names in its header.
+
+    Cached per ``(path, mtime_ns, size)``, like :func:`load_yaml`'s sidecar,
+    so a bitstream rebuilt in place is re-read (e.g. under ``--daemon``).
+    """
+    st = os.stat(fpgfile)
+    return _read_fpg_signature(fpgfile, st.st_mtime_ns, st.st_size)
+
+@lru_cache(maxsize=8)
+def _read_fpg_signature(fpgfile: str, mtime_ns: int, size: int
+                        ) -> Tuple[str, frozenset]:
+    with open(fpgfile, "rb") as fh:
+        fpg = fh.read()
+    header = fpg[:fpg.find(b"\n?quit\n")]
+    registers = frozenset(
+        line.split()[1].decode()
+        for line in header.splitlines() if line.startswith(b"?register")
+    )
+    return hashlib.md5(fpg).hexdigest(), registers
+
+def _needs_program(fpga, fpgfile: str) -> bool:
+    """Return ``False`` if *fpga* is already running the bitstream *fpgfile*.
+
+    ``TapcpTransport.get_metadata()`` describes the user image last written to
+    flash, including the md5 of the whole ``.fpg``. A board that has booted
+    its golden image since (e.g. after a power cycle) keeps that metadata, so
+    the design's registers must also show up in ``listdev``. Anything that
+    prevents the check counts as "needs programming".
+    """
+    try:
+        meta = fpga.transport.get_metadata() or {}
+        md5, registers = _fpg_signature(fpgfile)
+        if meta.get("md5sum") != md5:
+            LOGGER.debug("Flash holds %s, not %s", meta.get("filename"),
+                         Path(fpgfile).name)
+            return True
+        return not registers <= set(fpga.listdev())
+    except Exception as exc:
+        LOGGER.debug("Could not read the running design, programming: %r", exc)
+        return True
+
+def _build_destinations(common: dict, nchan_packet_cli: Optional[int]
+                        ) -> Tuple[List[dict], Dict[str, int]]:
+    """Return the ``dests`` list and ``{ip: mac}`` map shared by every board."""
+    nchan_packet = int(common.get("nchan_packet", nchan_packet_cli or 512))
+    nchan_default = int(common.get("nchan", nchan_packet))
+
+    destinations = common["destinations"]
+    dests: List[dict] = [
+        {
+            "ip": dest["ip"],
+            "port": int(dest["dest_port"]),
+            "start_chan": int(dest["start_chan"]),
+            "nchan": int(dest.get("nchan", nchan_default)),
+        }
+        for dest in destinations
+    ]
+    dest_macs = {dest["ip"]: _mac_to_int(dest["mac"]) for dest in destinations}
+    return dests, dest_macs
+
+def _connect_and_program(board: dict, common: dict,
+                         snap_ip: Optional[str],
+                         programmed: Optional[bool],
+                         feng_id: Optional[int],
+                         arp_table: Optional[Dict[str, int]] = None,
+                         ) -> dict:
+    """Program one SNAP board (unless already programmed) and attach to it.
+
+    This is the first configuration phase; it returns the per-board state
+    (``host``, ``snap``, ``source_ip``, ``source_mac``, ``feng_id``) consumed by
+    :func:`_configure_streaming`. With *snap_ip*, the source MAC is looked up
+    in *arp_table* (see :func:`_arp_table`), or in a fresh ARP read if omitted.
+    """
+    host = board["host"]
+    fpgfile = common["fpgfile"]
+
+    if snap_ip:
+        source_ip = snap_ip
+        # Obtaining SNAP board mac
+        source_mac = _arp_lookup(source_ip, arp_table)
+    else:
+        feng_id = int(board.get("feng_id", 0))
+        # ---------- Per‑board overrides ----------
+        source_ip = board["source_ip"]
+        source_mac = board["source_mac"]
+
+    # Connecting to the SNAP. This connects to the SNAP
+    # and uploads the bitstream to the SNAP. We do this before casm_f.snap_fengine.SnapFengine
+    # because it doesn't work with the max_time_delay error.
+    # The same CasperFpga handle is reused for the readiness poll below.
+    fpga = None
+    if programmed is False:
+        LOGGER.info("Connecting to %s at IP=%s …", host, source_ip)
+        fpga = CasperFpga(source_ip, transport=TapcpTransport)
+        if _needs_program(fpga, fpgfile):
+            LOGGER.info("Using CasperFpga at first, to fix max_time_delay error")
+            fpga.upload_to_ram_and_program(fpgfile)
+            time.sleep(_PROGRAM_SETTLE)
+        else:
+            LOGGER.info("%s is already running %s, skipping programming",
+                        host, Path(fpgfile).name)
+            programmed = True
+
+    _wait_ready(source_ip, fpga)
+    snap = _get_fengine(source_ip)
+
+    # Programming the SNAP. This is the main function that programs the SNAP
+    # and initializes the ADC.
+    if programmed is False:
+        try:
+            snap.program(fpgfile, initialize_adc=True)
+        except Exception:
+            LOGGER.warning("%s: initial program failed, attempting to initialize ADC", host)
+            snap.adc.initialize()
+            snap.program(fpgfile, initialize_adc=True)
+
+    return {
+        "host": host,
+        "snap": snap,
+        "source_ip": source_ip,
+        "source_mac": _mac_to_int(source_mac),
+        "feng_id": feng_id,
+    }
+
+def _configure_streaming(state: dict, common: dict,
+                         nchan_packet_cli: Optional[int],
+                         test_mode: Optional[str],
+                         adc_gain: Optional[int],
+                         eq_coeffs: Optional[float],
+                         fft_shift: Optional[int],
+                         dests: List[dict],
+                         dest_macs: Dict[str, int],
+                         ):
+    """Configure a programmed SNAP to stream to the common destinations.
+
+    *state* comes from :func:`_connect_and_program`; *dests* and *dest_macs*
+    from :func:`_build_destinations`, which is run once for all boards.
+    """
+    host = state["host"]
+    snap = state["snap"]
+    source_ip = state["source_ip"]
+    feng_id = state["feng_id"]
+
+    # ---------- Common parameters ----------
+    source_port = int(common.get("source_port", 10000))
+    nchan_packet = int(common.get("nchan_packet", nchan_packet_cli or 512))
+
+    # Per-board copies, in case configure() holds on to or edits them
+    dests = [dict(dest) for dest in dests]
+    macs: Dict[str, int] = {source_ip: state["source_mac"]}
+    macs.update(dest_macs)
+    LOGGER.debug("%s: macs=%r dests=%r", host, macs, dests)
+
+    LOGGER.info(
+        "Configuring %s (feng_id=%d) – src %s:%d → %d dests",
+        host,
+        feng_id,
+        source_ip,
+        source_port,
+        len(dests),
+    )
+
+    if adc_gain is not None:
+        snap.adc.initialize()
+        LOGGER.info("Setting ADC gain to %d", adc_gain)
+        _set_gain(snap.adc.adc.adc, adc_gain)
+
+    # Configuring the SNAP. This is the main function that configures the SNAP
+    # and begins the streaming of data to the destinations.
+    snap.configure(
+        source_ip=source_ip,
+        source_port=source_port,
+        program=False,
+        dests=dests,
+        macs=macs,
+        nchan_packet=nchan_packet,
+        enable_tx=False,
+        feng_id=feng_id,
+        fft_shift=fft_shift,
+    )
+
+    # Setting the EQ coefficients
+    if eq_coeffs is not None:
+        # Set to a fixed value; one array shared by all inputs
+        coeffs = np.full(512, eq_coeffs, dtype=np.float64)
+        for ii in range(12):
+            snap.eq.set_coeffs(ii, coeffs)
+    else:
+        # Flatten the bandpass
+        level(snap, ncoeffs=512, default_coeff=2.5)
+
+    # Setting the input mode
+    if test_mode is not None:
+        if test_mode == "zeros":
+            snap.input.use_zero()
+            LOGGER.info("Using zeros as input")
+        elif test_mode == "noise":
+            snap.input.use_noise()
+            LOGGER.info("Using ones as input")
+        elif test_mode == "counter":
+            snap.input.use_counter()
+            LOGGER.info("Using random as input")
+            
+    # The status readback is a round-trip to the board, only do it if logged
+    if LOGGER.isEnabledFor(logging.INFO):
+        eth_status, flags = snap.eth.get_status()  # type: ignore[attr‑defined]
+        LOGGER.info(
+            "%s: tx %.2f Gb/s – packets %d pps – flags %s",
+            host,
+            eth_status["gbps"],
+            eth_status["tx_ctr"],
+            flags,
+        )
+
+    return snap
+
+def concurrently(snaps, fn):
+    """
+    Run the given function concurrently on the given snaps
+    """
+    with ThreadPoolExecutor(max_workers=len(snaps)) as ex:
+        return list(ex.map(fn, snaps))
+
+def configure_concurrently(jobs: List[Tuple[str, Callable[[], object]]]) -> list:
+    """
+    Run the given per-board configuration jobs concurrently. *jobs* is a list
+    of ``(label, fn)`` pairs where *fn* takes no arguments and *label* is used
+    in error messages. Failed boards are logged and skipped; results are
+    returned in the order of *jobs*.
+    """
+    if not jobs:
+        return []
+    # One worker per board, like concurrently(): the jobs mostly wait on I/O
+    with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+        futs = {ex.submit(fn): label for label, fn in jobs}
+        for fut in as_completed(futs):
+            if fut.exception() is not None:
+                LOGGER.error("Configuration failed for %s", futs[fut],
+                             exc_info=fut.exception())
+    return [fut.result() for fut in futs if fut.exception() is None]
+
+def program_init(snaps, fpgfile):
+    """
+    Program the FPGAs and initialize the snaps using the given fpgfile
+    """
+    def one(s):
+        s.program(fpgfile)                    # program .fpg (and ADC trains if enabled)
+        s.initialize()         # init blocks + global reset
+        return s.hostname
+    return concurrently(snaps, one)
+
+def pps_two_ticks_ok(s):
+    # get_tt_of_pps(wait_for_sync=True) returns (tt, sync_number) for PPS:contentReference[oaicite:5]{index=5}
+    tt0, n0 = s.sync.get_tt_of_pps(wait_for_sync=True)
+    tt1, n1 = s.sync.get_tt_of_pps(wait_for_sync=True)
+    return (tt0, n0), (tt1, n1), (n1 == n0 + 1)
+
+def sync_time_using_update_telescope_time(snaps):
+    concurrently(snaps, lambda s: s.sync.set_output_sync_rate(0xe0000000))
+    concurrently(snaps, lambda s: s.sync.enable_loopback())
+    concurrently(snaps, lambda s: s.sync.update_telescope_time())
+    snaps[0].sync.get_tt_of_pps(wait_for_sync=True)
+    snaps[0].sync.wait_for_sync()
+    snaps[0].sync.wait_for_sync()
+    concurrently(snaps, lambda s: s.sync.update_internal_time())
+    # Reset DSP pipelines simultaneously on next sync
+    concurrently(snaps, lambda s: s.sync.arm_sync(wait_for_sync=True))
+    snaps[0].sync.wait_for_sync()
+
+def verify(snaps):
+    periods = concurrently(snaps, lambda s: s.sync.period_pps())
+    lastpps = concurrently(snaps, lambda s: s.sync.get_tt_of_pps(wait_for_sync=True))
+    # Check all boards saw the same PPS count
+    counts = [n for (tt, n) in lastpps]
+    if len(set(counts)) > 1:
+        LOGGER.warning("PPS counts differ across boards: %s", counts)
+    return periods, lastpps
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+
+# Choices for run() and the CLI flags; also used by scripts/start_snaps.py
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+TEST_MODES = ["zeros", "noise", "counter"]
+
+# Built once at import; argparse set-up is a noticeable slice of CLI start-up
+_PARSER = argparse.ArgumentParser(
+    description="Configure multiple CASM SNAP boards from YAML (common + boards schema)"
+)
+_PARSER.add_argument("layout_yaml", type=Path, help="YAML layout file")
+_PARSER.add_argument("--ip", type=str, nargs='+', help="IP address(es) of the SNAP to configure (single or multiple)", 
+                     default=None)
+_PARSER.add_argument("--nchan-packet", type=int, default=None, help="Override common.nchan_packet")
+_PARSER.add_argument("--do_sync", action="store_true", help="Do sync after configuring")
+_PARSER.add_argument("--log-level", default="INFO", choices=LOG_LEVELS)
+_PARSER.add_argument("--programmed", action="store_true", help="Skip CasperFpga pre-programming (board already programmed)")
+_PARSER.add_argument("--test-mode", type=str, default=None, help="Test mode for the SNAP", 
+                     choices=TEST_MODES)
+_PARSER.add_argument("--fft_shift", type=int, default=None, help="FFT shift for the SNAP")
+_PARSER.add_argument("--feng_id", type=str, nargs='+', help="Feng ID(s) for the SNAP", 
+                     default=None)
+_PARSER.add_argument("--eq_coeffs", type=int, default=None, help="EQ coefficients for the SNAP")
+_PARSER.add_argument("--adc_gain", type=float, default=None, 
+                     help="ADC gain for the SNAP must be one of: 1, 1.25, 2, 2.5, 4, 5, 8, 10, 12.5, 16, 20, 25, 32, 50.", 
+                     choices=list(GAIN_MAP))
+
+def _parse_args() -> argparse.Namespace:
+    return _PARSER.parse_args()
+
+def _setup_logging(level: str) -> None:
+    """Attach one stream handler to the root logger and set its *level*.
+
+    Safe to call repeatedly (e.g. from ``start_snaps.py --daemon``): the
+    handler is only added once, but the level follows the latest call.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(_LOG_FORMATTER)
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def run(layout_yaml: Union[str, Path],
+        ips: Optional[List[str]] = None,
+        nchan_packet: Optional[int] = None,
+        log_level: str = "INFO",
+        programmed: bool = False,
+        test_mode: Optional[str] = None,
+        fft_shift: Optional[int] = None,
+        feng_id: Optional[List[str]] = None,
+        eq_coeffs: Optional[float] = None,
+        adc_gain: Optional[float] = None,
+        do_sync: bool = False,
+        ) -> list:
+    """Configure the SNAPs described by *layout_yaml* and enable their TX.
+
+    Keyword arguments mirror the CLI flags of :func:`main`, so callers such as
+    ``scripts/start_snaps.py`` can skip the argv round-trip. Returns the list of
+    configured ``SnapFengine`` objects, empty if no board came up.
+
+    Raises :class:`ConfigError` for an option outside the choices the CLI
+    accepts, or a layout that cannot be parsed, before any board is touched.
+    """
+    # The checks argparse does for main(), for callers that skip it
+    if log_level not in LOG_LEVELS:
+        raise ConfigError("log_level must be one of %s, not %r"
+                          % (", ".join(LOG_LEVELS), log_level))
+    if test_mode is not None and test_mode not in TEST_MODES:
+        raise ConfigError("test_mode must be one of %s, not %r"
+                          % (", ".join(TEST_MODES), test_mode))
+    if adc_gain is not None and adc_gain not in GAIN_MAP:
+        raise ConfigError("adc_gain must be one of %s, not %r"
+                          % (", ".join(map(str, GAIN_MAP)), adc_gain))
+
+    _setup_logging(log_level)
+
+    try:
+        common, boards = _load_layout(layout_yaml)
+        dests, dest_macs = _build_destinations(common, nchan_packet)
+    except Exception as exc:
+        raise ConfigError("Failed to parse YAML layout %s: %s"
+                          % (layout_yaml, exc)) from exc
+    
+    # If IP addresses are provided, configure the board with the given IP address
+    if ips is not None:
+        # One snapshot of the ARP cache serves every requested IP
+        arp_table = _arp_table()
+        jobs = []
+        for kk, ip in enumerate(ips):
+            if feng_id is not None:
+                board_feng_id = int(feng_id[kk])
+            else:
+                board_feng_id = kk
+            jobs.append(("IP %s" % ip, _dropping_fengine(ip, partial(
+                _connect_and_program, boards[0], common,
+                ip, programmed=programmed,
+                feng_id=board_feng_id,
+                arp_table=arp_table,
+            ))))
+
+    # If no IP addresses are provided, configure all boards from the yaml file
+    else:
+        jobs = [
+            ("board %s" % board.get("host"), _dropping_fengine(
+                board.get("source_ip"), partial(
+                    _connect_and_program, board, common,
+                    snap_ip=None,
+                    programmed=programmed,
+                    feng_id=None,
+                )))
+            for board in boards
+        ]
+
+    # Two fan-outs: program every board at once, then configure streaming on
+    # the boards that came up
+    states = configure_concurrently(jobs)
+    LOGGER.info("%d boards connected and ready", len(states))
+    snaps = configure_concurrently([
+        ("%s (%s)" % (state["host"], state["source_ip"]), _dropping_fengine(
+            state["source_ip"], partial(
+                _configure_streaming, state, common, nchan_packet,
+                test_mode=test_mode,
+                adc_gain=adc_gain,
+                eq_coeffs=eq_coeffs,
+                fft_shift=fft_shift,
+                dests=dests, dest_macs=dest_macs,
+            )))
+        for state in states
+    ])
+
+    LOGGER.info("All requested boards processed. %d boards configured.", len(snaps))
+    if not snaps:
+        LOGGER.error("No boards configured, skipping sync and TX enable")
+        return snaps
+
+    if do_sync is True:
+        LOGGER.info("Doing sync")
+        # PPS presence sanity
+        checks = concurrently(snaps, pps_two_ticks_ok)
+        for s, ((tt0,n0),(tt1,n1),ok) in zip(snaps, checks):
+            LOGGER.info("%s: PPS tick check ok=%s  (tt,n): (%s,%s) -> (%s,%s)",
+                        s.hostname, ok, tt0, n0, tt1, n1)
+
+        # Robust alignment to PPS-locked telescope time
+        sync_time_using_update_telescope_time(snaps)
+
+        # Verify
+        periods, lastpps = verify(snaps)
+        LOGGER.info("period_pps: %s", {s.hostname: p for s,p in zip(snaps, periods)})
+        LOGGER.info("get_tt_of_pps: %s", {s.hostname: v for s,v in zip(snaps, lastpps)})
+
+        # Convenience: print TT delta in clocks and seconds vs reference board
+        tt_ref, n_ref = lastpps[0]
+        for s, (tt, n), period in zip(snaps, lastpps, periods):
+            dclks = tt - tt_ref
+            LOGGER.info(
+                "%s: PPS count=%d  TT delta vs %s [clks]: %d  [s]: %f",
+                s.hostname, n, snaps[0].hostname, dclks, dclks / float(period),
+            )
+
+    concurrently(snaps, lambda s: s.eth.enable_tx())
+    return snaps
+
+def main() -> None:  # pragma: no cover
+    args = _parse_args()
+    try:
+        snaps = run(
+            args.layout_yaml,
+            ips=args.ip,
+            nchan_packet=args.nchan_packet,
+            log_level=args.log_level,
+            programmed=args.programmed,
+            test_mode=args.test_mode,
+            fft_shift=args.fft_shift,
+            feng_id=args.feng_id,
+            eq_coeffs=args.eq_coeffs,
+            adc_gain=args.adc_gain,
+            do_sync=args.do_sync,
+        )
+    except ConfigError as exc:
+        LOGGER.error("%s", exc)
+        sys.exit(1)
+    if not snaps:
+        sys.exit(1)
+
+if __name__ == "__main__":  # pragma: no cover
+     main()
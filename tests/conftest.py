@@ -0,0 +1,38 @@
+"""Test set-up: stand-ins for the CASM hardware libraries.
+
+multi_snap_config exits at import without ``casm_f`` and imports
+``casperfpga`` at module level. Neither is needed by the helpers under test,
+so empty stand-ins are registered when the real packages are not installed.
+"""
+import importlib.util
+import sys
+import types
+
+
+class _Unavailable:
+    """Placeholder for a hardware class; fails loudly if a test touches it."""
+
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("%s is a test stand-in" % type(self).__name__)
+
+
+def _stub(name, **attrs):
+    module = types.ModuleType(name)
+    for attr, value in attrs.items():
+        setattr(module, attr, value)
+    sys.modules[name] = module
+    return module
+
+
+if importlib.util.find_spec("casm_f") is None:
+    _stub("casm_f").snap_fengine = _stub(
+        "casm_f.snap_fengine",
+        SnapFengine=type("SnapFengine", (_Unavailable,), {}),
+    )
+
+if importlib.util.find_spec("casperfpga") is None:
+    _stub(
+        "casperfpga",
+        CasperFpga=type("CasperFpga", (_Unavailable,), {}),
+        TapcpTransport=type("TapcpTransport", (), {}),
+    )
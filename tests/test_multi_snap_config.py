@@ -0,0 +1,185 @@
+"""Tests for the helpers in multi_snap_config."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+# conftest.py stands in for casm_f/casperfpga when they are not installed
+from snap_control import multi_snap_config
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_smooth_decimate_matches_savgol_filter(seed):
+    signal = pytest.importorskip("scipy.signal")
+    rng = np.random.default_rng(seed)
+    # Positive, bandpass-like spectrum: a slope plus noise
+    data = np.linspace(1e4, 5e4, 4096) + rng.random(4096) * 1e4
+
+    expected = signal.savgol_filter(data, 32, 3)[4::8]
+    np.testing.assert_allclose(
+        multi_snap_config._smooth_decimate(data), expected, rtol=1e-9
+    )
+
+
+# -----------------------------------------------------------------------------
+# load_yaml sidecar cache
+# -----------------------------------------------------------------------------
+
+def _sidecar(path):
+    return path.with_suffix(path.suffix + ".json")
+
+
+def test_load_yaml_reuses_sidecar(tmp_path):
+    path = tmp_path / "layout.yaml"
+    path.write_text("common: {nchan: 512}\nboards: [snap01]\n")
+
+    assert multi_snap_config.load_yaml(path) == {
+        "common": {"nchan": 512}, "boards": ["snap01"],
+    }
+    # Prove the second load comes from the sidecar, not the parser
+    cached = json.loads(_sidecar(path).read_text())
+    cached["data"] = {"from": "sidecar"}
+    _sidecar(path).write_text(json.dumps(cached))
+    assert multi_snap_config.load_yaml(path) == {"from": "sidecar"}
+
+
+def test_load_yaml_stamp_invalidates_sidecar(tmp_path):
+    path = tmp_path / "layout.yaml"
+    path.write_text("nchan: 512\n")
+    multi_snap_config.load_yaml(path)
+
+    # Same size, new mtime
+    path.write_text("nchan: 256\n")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert multi_snap_config.load_yaml(path) == {"nchan": 256}
+    assert json.loads(_sidecar(path).read_text())["data"] == {"nchan": 256}
+
+
+@pytest.mark.parametrize("text", ["1: a\n", "when: 2024-01-01\n"])
+def test_load_yaml_skips_cache_json_cannot_round_trip(tmp_path, text):
+    path = tmp_path / "layout.yaml"
+    path.write_text(text)
+    expected = multi_snap_config.yaml.safe_load(text)
+
+    assert multi_snap_config.load_yaml(path) == expected
+    assert not _sidecar(path).exists()
+    assert multi_snap_config.load_yaml(path) == expected
+
+
+def test_load_yaml_empty_file(tmp_path):
+    path = tmp_path / "empty.yaml"
+    path.write_bytes(b"")
+    assert multi_snap_config.load_yaml(path) is None
+    assert multi_snap_config.load_yaml(path) is None
+
+
+def test_load_yaml_corrupt_sidecar(tmp_path):
+    path = tmp_path / "layout.yaml"
+    path.write_text("nchan: 512\n")
+    _sidecar(path).write_text("{not json")
+    assert multi_snap_config.load_yaml(path) == {"nchan": 512}
+
+
+def test_load_yaml_unwritable_sidecar(tmp_path):
+    path = tmp_path / "layout.yaml"
+    path.write_text("nchan: 512\n")
+    # A directory in the sidecar's place can be neither read nor replaced
+    # (a read-only directory would not stop root)
+    _sidecar(path).mkdir()
+    assert multi_snap_config.load_yaml(path) == {"nchan": 512}
+    assert multi_snap_config.load_yaml(path) == {"nchan": 512}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+# -----------------------------------------------------------------------------
+# ARP table
+# -----------------------------------------------------------------------------
+
+_PROC_NET_ARP = """\
+IP address       HW type     Flags       HW address            Mask     Device
+192.168.0.126    0x1         0x2         00:25:90:c2:b1:a0     *        eth0
+192.168.0.127    0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.0.101    0x1         0x2         00:25:90:C2:B1:A1     *        eth1
+"""
+
+_ARP_N = b"""\
+Address                  HWtype  HWaddress           Flags Mask            Iface
+192.168.0.126            ether   00:25:90:c2:b1:a0   C                     eth0
+192.168.0.127                    (incomplete)                              eth0
+192.168.0.101            ether   00:25:90:c2:b1:a1   C                     eth1
+"""
+
+_EXPECTED_ARP = {
+    "192.168.0.126": 0x002590C2B1A0,
+    "192.168.0.101": 0x002590C2B1A1,
+}
+
+
+def test_arp_table_from_proc(tmp_path, monkeypatch):
+    proc = tmp_path / "arp"
+    proc.write_text(_PROC_NET_ARP)
+    monkeypatch.setattr(multi_snap_config, "_PROC_ARP", str(proc))
+
+    # Incomplete entries (flags 0x0) are left out
+    assert multi_snap_config._arp_table() == _EXPECTED_ARP
+
+
+def test_arp_table_falls_back_to_arp_n(tmp_path, monkeypatch):
+    class FakePopen:
+        def __init__(self, args, stdout=None):
+            assert args == ["arp", "-n"]
+
+        def communicate(self):
+            return _ARP_N, None
+
+    monkeypatch.setattr(multi_snap_config, "_PROC_ARP", str(tmp_path / "none"))
+    monkeypatch.setattr(multi_snap_config, "Popen", FakePopen)
+    assert multi_snap_config._arp_table() == _EXPECTED_ARP
+
+
+def test_arp_lookup_missing_entry():
+    with pytest.raises(LookupError, match="192.168.0.127"):
+        multi_snap_config._arp_lookup("192.168.0.127", _EXPECTED_ARP)
+
+
+# -----------------------------------------------------------------------------
+# run() argument checks
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("kwargs, match", [
+    ({"log_level": "info"}, "log_level"),
+    ({"test_mode": "zero"}, "test_mode"),
+    ({"adc_gain": 7}, "adc_gain"),
+])
+def test_run_rejects_bad_options(tmp_path, monkeypatch, kwargs, match):
+    def fail(*args, **kw):
+        raise AssertionError("run() got past its option checks")
+
+    monkeypatch.setattr(multi_snap_config, "load_yaml", fail)
+    with pytest.raises(multi_snap_config.ConfigError, match=match):
+        multi_snap_config.run(tmp_path / "layout.yaml", **kwargs)
+
+
+def test_run_rejects_bad_layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_snap_config, "_setup_logging", lambda level: None)
+    path = tmp_path / "layout.yaml"
+    path.write_text("boards: []\n")
+
+    with pytest.raises(multi_snap_config.ConfigError, match="layout"):
+        multi_snap_config.run(path)
+
+
+def test_run_without_boards_returns_empty(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_snap_config, "_setup_logging", lambda level: None)
+    path = tmp_path / "layout.yaml"
+    path.write_text(
+        "common:\n"
+        "  fpgfile: snap.fpg\n"
+        "  destinations:\n"
+        "    - {ip: 10.0.0.1, mac: '00:00:00:00:00:01', start_chan: 0, dest_port: 1}\n"
+        "boards: []\n"
+    )
+    # No board, so nothing reaches the sync or TX-enable fan-outs
+    assert multi_snap_config.run(path) == []